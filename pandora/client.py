@@ -14,7 +14,44 @@ For simplicity use a client builder from pandora.clientbuilder to create an
 instance of a client.
 """
 
+import time
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
 from . import errors
+from .models.ad import AdItem
+from .models.search import SearchResult
+from .models.bookmark import BookmarkList
+from .models.station import Station, StationList, GenreStationList
+from .models.playlist import (
+    Playlist,
+    LOW_AUDIO_QUALITY,
+    MED_AUDIO_QUALITY,
+    HIGH_AUDIO_QUALITY,
+)
+
+# Fixed options sent with some API calls to ask for the extended responses
+# that the models expect
+_USER_LOGIN_OPTIONS = {
+    "includePandoraOneInfo": True,
+    "includeSubscriptionExpiration": True,
+    "returnCapped": True,
+    "includeAdAttributes": True,
+    "includeAdvertiserAttributes": True,
+    "xplatformAdCapable": True,
+}
+
+_PLAYLIST_OPTIONS = {
+    "includeTrackLength": True,
+    "xplatformAdCapable": True,
+    "audioAdPodCapable": True,
+}
+
+_AD_METADATA_OPTIONS = {
+    "returnAdTrackingTokens": True,
+    "supportAudioAds": True,
+}
 
 
 class BaseAPIClient:
@@ -22,11 +59,16 @@ class BaseAPIClient:
 
     The base API client has lower level methods that are composed together to
     provide higher level functionality.
+
+    The client may be called from several threads at once. Logging in again
+    after the auth token expires is serialized so only one thread resets the
+    shared transport. The login lock is shared with the transport, which
+    builds requests under it, so no request sees a login half done.
     """
 
-    LOW_AUDIO_QUALITY = "lowQuality"
-    MED_AUDIO_QUALITY = "mediumQuality"
-    HIGH_AUDIO_QUALITY = "highQuality"
+    LOW_AUDIO_QUALITY = LOW_AUDIO_QUALITY
+    MED_AUDIO_QUALITY = MED_AUDIO_QUALITY
+    HIGH_AUDIO_QUALITY = HIGH_AUDIO_QUALITY
 
     ALL_QUALITIES = [LOW_AUDIO_QUALITY, MED_AUDIO_QUALITY, HIGH_AUDIO_QUALITY]
 
@@ -45,6 +87,8 @@ class BaseAPIClient:
         self.default_audio_quality = default_audio_quality
         self.username = None
         self.password = None
+        self._auth_lock = threading.RLock()
+        self.transport.auth_lock = self._auth_lock
 
     def _partner_login(self):
         partner = self.transport(
@@ -62,7 +106,9 @@ class BaseAPIClient:
     def login(self, username, password):
         self.username = username
         self.password = password
-        return self._authenticate()
+
+        with self._auth_lock:
+            return self._authenticate()
 
     def _authenticate(self):
         self._partner_login()
@@ -73,12 +119,7 @@ class BaseAPIClient:
                 loginType="user",
                 username=self.username,
                 password=self.password,
-                includePandoraOneInfo=True,
-                includeSubscriptionExpiration=True,
-                returnCapped=True,
-                includeAdAttributes=True,
-                includeAdvertiserAttributes=True,
-                xplatformAdCapable=True,
+                **_USER_LOGIN_OPTIONS,
             )
         except errors.InvalidPartnerLogin:
             raise errors.InvalidUserLogin()
@@ -99,33 +140,133 @@ class BaseAPIClient:
                 return []
 
     def __call__(self, method, **kwargs):
+        # Wait out any login in progress, the token the call is sent with
+        # tells whether another thread has logged in again since
+        with self._auth_lock:
+            auth_token = self.transport.auth_token
+
         try:
             return self.transport(method, **kwargs)
         except errors.InvalidAuthToken:
-            self._authenticate()
+            with self._auth_lock:
+                # Parallel calls all see the token expire, only the first to
+                # get here logs in again and the rest retry with its token
+                if self.transport.auth_token == auth_token:
+                    self._authenticate()
+
             return self.transport(method, **kwargs)
 
+    def close(self):
+        """Close the pooled connections held by the transport"""
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 class APIClient(BaseAPIClient):
     """High Level Pandora API Client
 
     The high level API client implements the entire functional API for Pandora.
     This is what clients should actually use.
+
+    The station and genre station lists are large but rarely change so the
+    last fetched copy is kept and only refetched when the checksum reported
+    by the API no longer matches it.
     """
 
+    EXPLAIN_TRACK_CACHE_SIZE = 256
+
+    # Playlist audio URLs are time limited so prefetched playlists are only
+    # handed out for a few minutes after the fetch started
+    PREFETCHED_PLAYLIST_TTL = 300
+
+    # get_playlists fetches up to 8 playlists at once and each of those
+    # fetches its ads in parallel, keep the product within the transport's
+    # pool of 16 connections
+    AD_FETCH_WORKERS = 2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._station_list = None
+        self._genre_stations = None
+        self._track_explanations = {}
+        self._track_explanations_lock = threading.Lock()
+        self._prefetched_playlists = {}
+        self._background_executor = None
+
+    def close(self):
+        if self._background_executor is not None:
+            self._background_executor.shutdown()
+            self._background_executor = None
+
+        super().close()
+
     def get_station_list(self):
-        from .models.station import StationList
+        cached = self._station_list
+
+        if cached is not None and not cached.has_changed():
+            return cached
 
-        return StationList.from_json(
+        self._station_list = StationList.from_json(
             self, self("user.getStationList", includeStationArtUrl=True)
         )
 
+        return self._station_list
+
     def get_station_list_checksum(self):
         return self("user.getStationListChecksum")["checksum"]
 
+    @staticmethod
+    def _playlist_key(station_token, additional_urls):
+        return station_token, tuple(additional_urls or ())
+
+    def prefetch_playlist(self, station_token, additional_urls=None):
+        """Fetch a playlist in the background for the next get_playlist"""
+        now = time.monotonic()
+
+        # Drop prefetches that were never used and have gone stale
+        self._prefetched_playlists = {
+            key: prefetched
+            for key, prefetched in self._prefetched_playlists.items()
+            if now - prefetched[0] < self.PREFETCHED_PLAYLIST_TTL
+        }
+
+        key = self._playlist_key(station_token, additional_urls)
+        self._prefetched_playlists[key] = (
+            now,
+            self._run_in_background(
+                self._fetch_playlist, station_token, additional_urls
+            ),
+        )
+
+    def _run_in_background(self, func, *args):
+        # One worker thread is kept for the life of the client for work that
+        # overlaps the caller's own API calls
+        if self._background_executor is None:
+            self._background_executor = ThreadPoolExecutor(max_workers=1)
+
+        return self._background_executor.submit(func, *args)
+
     def get_playlist(self, station_token, additional_urls=None):
-        from .models.playlist import Playlist
+        if self._prefetched_playlists:
+            key = self._playlist_key(station_token, additional_urls)
+            prefetched = self._prefetched_playlists.pop(key, None)
+
+            # Stale or failed prefetches fall back to fetching it now
+            if prefetched is not None:
+                started, future = prefetched
+                ttl = self.PREFETCHED_PLAYLIST_TTL
+
+                if time.monotonic() - started < ttl and not future.exception():
+                    return future.result()
 
+        return self._fetch_playlist(station_token, additional_urls)
+
+    def _fetch_playlist(self, station_token, additional_urls):
         if additional_urls is None:
             additional_urls = []
 
@@ -137,10 +278,8 @@ class APIClient(BaseAPIClient):
         resp = self(
             "station.getPlaylist",
             stationToken=station_token,
-            includeTrackLength=True,
-            xplatformAdCapable=True,
-            audioAdPodCapable=True,
             additionalAudioUrl=",".join(urls),
+            **_PLAYLIST_OPTIONS,
         )
 
         for item in resp["items"]:
@@ -148,21 +287,30 @@ class APIClient(BaseAPIClient):
 
         playlist = Playlist.from_json(self, resp)
 
-        for i, track in enumerate(playlist):
-            if track.is_ad:
-                track = self.get_ad_item(station_token, track.ad_token)
-                playlist[i] = track
+        # Each ad needs its own metadata call, fetch them all in parallel
+        ad_indexes = [i for i, track in enumerate(playlist) if track.is_ad]
+
+        if ad_indexes:
+            ads = self._map_concurrently(
+                partial(self.get_ad_item, station_token),
+                [playlist[i].ad_token for i in ad_indexes],
+                min(len(ad_indexes), self.AD_FETCH_WORKERS),
+            )
+
+            for i, ad in zip(ad_indexes, ads):
+                playlist[i] = ad
 
         return playlist
 
-    def get_bookmarks(self):
-        from .models.bookmark import BookmarkList
+    def get_playlists(self, station_tokens, max_workers=8):
+        return self._map_concurrently(
+            self.get_playlist, station_tokens, max_workers
+        )
 
+    def get_bookmarks(self):
         return BookmarkList.from_json(self, self("user.getBookmarks"))
 
     def get_station(self, station_token):
-        from .models.station import Station
-
         return Station.from_json(
             self,
             self(
@@ -172,6 +320,17 @@ class APIClient(BaseAPIClient):
             ),
         )
 
+    @staticmethod
+    def _map_concurrently(func, items, max_workers):
+        """Call func for each item in parallel, results are in item order"""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def get_stations(self, station_tokens, max_workers=8):
+        return self._map_concurrently(
+            self.get_station, station_tokens, max_workers
+        )
+
     def add_artist_bookmark(self, track_token):
         return self("bookmark.addArtistBookmark", trackToken=track_token)
 
@@ -194,8 +353,6 @@ class APIClient(BaseAPIClient):
         include_near_matches=False,
         include_genre_stations=False,
     ):
-        from .models.search import SearchResult
-
         return SearchResult.from_json(
             self,
             self(
@@ -225,8 +382,6 @@ class APIClient(BaseAPIClient):
         track_token=None,
         song_token=None,
     ):
-        from .models.station import Station
-
         kwargs = {}
 
         if search_token:
@@ -252,12 +407,27 @@ class APIClient(BaseAPIClient):
         return self("station.deleteStation", stationToken=station_token)
 
     def get_genre_stations(self):
-        from .models.station import GenreStationList
+        if self._genre_stations is not None:
+            checksum = self.get_genre_stations_checksum()
 
-        genre_stations = GenreStationList.from_json(
-            self, self("station.getGenreStations")
-        )
-        genre_stations.checksum = self.get_genre_stations_checksum()
+            if checksum == self._genre_stations.checksum:
+                return self._genre_stations
+
+            data = self("station.getGenreStations")
+        else:
+            # Nothing to validate yet so the list and its checksum are
+            # independent, fetch the checksum while the list loads. Both go
+            # through __call__ so an expired token is only renewed once.
+            checksum = self._run_in_background(
+                self.get_genre_stations_checksum
+            )
+            data = self("station.getGenreStations")
+            checksum = checksum.result()
+
+        genre_stations = GenreStationList.from_json(self, data)
+        genre_stations.checksum = checksum
+
+        self._genre_stations = genre_stations
 
         return genre_stations
 
@@ -272,10 +442,37 @@ class APIClient(BaseAPIClient):
         )
 
     def explain_track(self, track_token):
-        return self("track.explainTrack", trackToken=track_token)
+        # The explanation for a track token never changes. The cache is
+        # bounded and evicts in insertion order, the oldest entry first.
+        explanations = self._track_explanations
+
+        with self._track_explanations_lock:
+            explanation = explanations.get(track_token)
+
+        if explanation is None:
+            explanation = self("track.explainTrack", trackToken=track_token)
+
+            with self._track_explanations_lock:
+                if len(explanations) >= self.EXPLAIN_TRACK_CACHE_SIZE:
+                    explanations.pop(next(iter(explanations)), None)
+
+                explanations[track_token] = explanation
+
+        return explanation
+
+    @staticmethod
+    def _list_args(args):
+        # Accept either a single list or tuple of values or the values as
+        # separate arguments so large lists don't need to be unpacked
+        if len(args) == 1 and isinstance(args[0], (list, tuple)):
+            return args[0]
+
+        return args
 
     def set_quick_mix(self, *args):
-        return self("user.setQuickMix", quickMixStationIds=args)
+        return self(
+            "user.setQuickMix", quickMixStationIds=self._list_args(args)
+        )
 
     def sleep_song(self, track_token):
         return self("user.sleepSong", trackToken=track_token)
@@ -285,7 +482,7 @@ class APIClient(BaseAPIClient):
             "station.shareStation",
             stationId=station_id,
             stationToken=station_token,
-            emails=emails,
+            emails=self._list_args(emails),
         )
 
     def transform_shared_station(self, station_token):
@@ -295,12 +492,12 @@ class APIClient(BaseAPIClient):
 
     def share_music(self, music_token, *emails):
         return self(
-            "music.shareMusic", musicToken=music_token, email=emails[0]
+            "music.shareMusic",
+            musicToken=music_token,
+            email=self._list_args(emails)[0],
         )
 
     def get_ad_item(self, station_id, ad_token):
-        from .models.ad import AdItem
-
         if not station_id:
             msg = "The 'station_id' param must be defined, got: '{}'"
             raise errors.ParameterMissing(msg.format(station_id))
@@ -314,8 +511,7 @@ class APIClient(BaseAPIClient):
         return self(
             "ad.getAdMetadata",
             adToken=ad_token,
-            returnAdTrackingTokens=True,
-            supportAudioAds=True,
+            **_AD_METADATA_OPTIONS,
         )
 
     def register_ad(self, station_id, tokens):
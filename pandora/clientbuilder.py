@@ -7,7 +7,6 @@ configuration formats into a fully built APIClient.
 
 import os.path
 
-from configparser import ConfigParser
 from .client import APIClient
 from .transport import Encryptor, APITransport, DEFAULT_API_HOST
 
@@ -64,7 +63,8 @@ class TranslatingDict(dict):
         if hasattr(value, "strip"):
             value = value.strip()
 
-        return self.VALUE_TRANSLATIONS.get(key, lambda v: v)(value)
+        translator = self.VALUE_TRANSLATIONS.get(key)
+        return translator(value) if translator else value
 
     def put(self, key, value):
         self[key] = value
@@ -184,10 +184,14 @@ class FileBasedClientBuilder(APIClientBuilder):
         raise NotImplementedError
 
     def build(self):
-        if not self.file_exists:
-            raise IOError("File not found: {}".format(self.path))
+        # Let parse_config open the file rather than checking for it first,
+        # callers usually check file_exists before building so stat-ing
+        # again here would just be a wasted syscall
+        try:
+            config = self.parse_config()
+        except FileNotFoundError as exc:
+            raise IOError("File not found: {}".format(self.path)) from exc
 
-        config = self.parse_config()
         client = self.build_from_settings_dict(config)
 
         if self.authenticate:
@@ -208,11 +212,19 @@ class PydoraConfigFileBuilder(FileBasedClientBuilder):
 
     @staticmethod
     def cfg_to_dict(cfg, key, kind=SettingsDict):
-        return kind(
-            (k.strip().upper(), v.strip()) for k, v in cfg.items(key, raw=True)
-        )
+        items = cfg.items(key, raw=True)
+
+        # Translating dicts already normalize their keys and values
+        if issubclass(kind, TranslatingDict):
+            return kind(items)
+
+        return kind((k.strip().upper(), v.strip()) for k, v in items)
 
     def parse_config(self):
+        # configparser is only needed for this format, most programs build
+        # their client from a settings dict so it's not imported up front
+        from configparser import ConfigParser
+
         cfg = ConfigParser()
 
         with open(self.path) as file:
@@ -254,11 +266,16 @@ class PianobarConfigFileBuilder(FileBasedClientBuilder):
         settings = PianobarSettingsDict()
 
         with open(self.path, "r") as file:
-            for line in file.readlines():
+            for line in file:
                 line = line.strip()
 
-                if line and not line.startswith("#"):
-                    settings.put(*line.split("=", 1))
+                if not line or line.startswith("#"):
+                    continue
+
+                # Lines without a value are not settings, skip them
+                key, sep, value = line.partition("=")
+                if sep:
+                    settings[key] = value
 
         settings["USER"] = {
             "USERNAME": settings.pop("USER"),
@@ -44,6 +44,9 @@ __API_EXCEPTIONS__ = {
     9999: "Authentication Required",
 }
 
+# Exception classes by API code, filled in by export_exceptions
+_EXCEPTIONS_BY_CODE = {}
+
 
 class PandoraException(Exception):
     """Pandora API Exception
@@ -60,14 +63,14 @@ class PandoraException(Exception):
 
     @classmethod
     def from_code(cls, code, extended_message):
-        exc = __API_EXCEPTIONS__.get(code)
+        exc_class = _EXCEPTIONS_BY_CODE.get(code)
 
-        if not exc:
+        if not exc_class:
             exc = PandoraException(extended_message)
             exc.code = code
             return exc
         else:
-            return exc(extended_message)
+            return exc_class(extended_message)
 
     @staticmethod
     def _format_name(name):
@@ -95,7 +98,7 @@ class PandoraException(Exception):
                 },
             )
 
-            export_to[name] = __API_EXCEPTIONS__[code] = exception
+            export_to[name] = _EXCEPTIONS_BY_CODE[code] = exception
 
 
 PandoraException.export_exceptions(locals())
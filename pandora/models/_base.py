@@ -1,7 +1,13 @@
+import copy
 from datetime import datetime
 from collections import namedtuple
 
 
+# DateField converts a timestamp for every dated model, bind the constructor
+# once rather than looking it up on the class each time
+_utcfromtimestamp = datetime.utcfromtimestamp
+
+
 class Field(namedtuple("Field", ["field", "default", "formatter", "model"])):
     """Model Field
 
@@ -67,21 +73,175 @@ class DateField(SyntheticField):
         if not newval:
             return None
 
-        return datetime.utcfromtimestamp(newval["time"] / 1000)
+        return _utcfromtimestamp(newval["time"] / 1000)
+
+
+# Source templates for the populate functions generated by ModelMetaClass,
+# each field is a sequence of these with its plan index and names filled in
+_POPULATE_HEADER = """\
+def populate(api_client, instance, data):
+    get = data.get
+"""
+
+_POPULATE_GET = """\
+    value = get({field!r}, default_{i})
+"""
+
+_POPULATE_GET_OR_COPY = """\
+    value = get({field!r}, missing)
+    if value is missing:
+        value = copy_default(default_{i})
+"""
+
+_POPULATE_SYNTHESIZE = """\
+    value = synthesize_{i}(api_client, data, value)
+"""
+
+_POPULATE_MODEL = """\
+    if value:
+        if isinstance(value, list):
+            value = model_{i}.from_json_list(api_client, value)
+        else:
+            value = model_{i}.from_json(api_client, value)
+"""
+
+_POPULATE_FORMATTER = """\
+    if value:
+        value = formatter_{i}(api_client, value)
+"""
+
+_POPULATE_SET = """\
+    instance.{key} = value
+"""
 
 
 class ModelMetaClass(type):
-    def __new__(cls, name, parents, dct):
-        dct["_fields"] = fields = {}
-        new_dct = dct.copy()
+    # Defaults of these types are immutable and shared between instances, any
+    # other default is used as a type and a new value created per instance
+    SAFE_DEFAULT_TYPES = (type(None), str, bytes, int, bool)
+
+    # Defaults of these types are copied when populating a model from JSON so
+    # instances never share a container, any other default is used as-is
+    MUTABLE_DEFAULT_TYPES = (list, dict, set)
+
+    @classmethod
+    def _build_defaults(cls, fields):
+        defaults = []
+
+        for key, value in fields.items():
+            default = getattr(value, "default", None)
+
+            if isinstance(default, cls.SAFE_DEFAULT_TYPES):
+                defaults.append((key, default, None))
+            else:
+                defaults.append((key, None, type(default)))
+
+        return tuple(defaults)
+
+    @staticmethod
+    def _build_populate_plan(fields):
+        plan = []
+
+        for key, value in fields.items():
+            if isinstance(value, SyntheticField):
+                plan.append(
+                    (key, value.field, None, value.formatter, None, None)
+                )
+            else:
+                plan.append(
+                    (
+                        key,
+                        value.field,
+                        value.default,
+                        None,
+                        value.model,
+                        value.formatter,
+                    )
+                )
+
+        return tuple(plan)
+
+    @classmethod
+    def _build_populate(cls, name, plan):
+        """Generate a straight-line populate function for a populate plan
+
+        The schema of a model is fixed once the class is created so rather
+        than looping over the plan for every model built, each entry becomes a
+        few lines of a function specialized to the class. The defaults,
+        models and formatters are bound into the function's globals.
+        """
+        namespace = {"missing": object(), "copy_default": copy.copy}
+        source = [_POPULATE_HEADER]
+
+        for i, entry in enumerate(plan):
+            key, field, default, synthesize, model, formatter = entry
+
+            namespace["synthesize_{}".format(i)] = synthesize
+            namespace["model_{}".format(i)] = model
+            namespace["formatter_{}".format(i)] = formatter
+
+            namespace["default_{}".format(i)] = default
+
+            if isinstance(default, cls.MUTABLE_DEFAULT_TYPES):
+                parts = [_POPULATE_GET_OR_COPY]
+            else:
+                parts = [_POPULATE_GET]
+
+            if synthesize:
+                parts.append(_POPULATE_SYNTHESIZE)
+
+            if model:
+                parts.append(_POPULATE_MODEL)
+
+            if formatter:
+                parts.append(_POPULATE_FORMATTER)
+
+            parts.append(_POPULATE_SET)
+
+            source.extend(
+                part.format(i=i, key=key, field=field) for part in parts
+            )
+
+        code = compile("".join(source), "<populate {}>".format(name), "exec")
+        exec(code, namespace)
+
+        return namespace["populate"]
+
+    @staticmethod
+    def _inherited_slots(parents):
+        slots = set()
 
-        for key, val in dct.items():
-            if key.startswith("__"):
-                continue
+        for parent in parents:
+            for klass in parent.__mro__:
+                slots.update(klass.__dict__.get("__slots__", ()))
 
-            if isinstance(val, Field) or isinstance(val, SyntheticField):
-                fields[key] = val
-                del new_dct[key]
+        return slots
+
+    def __new__(cls, name, parents, dct):
+        fields = {
+            key: val
+            for key, val in dct.items()
+            if not key.startswith("__")
+            if isinstance(val, (Field, SyntheticField))
+        }
+
+        new_dct = {key: val for key, val in dct.items() if key not in fields}
+        new_dct["_fields"] = fields
+        new_dct["_defaults"] = cls._build_defaults(fields)
+        new_dct["_populate_plan"] = plan = cls._build_populate_plan(fields)
+        new_dct["_populate"] = staticmethod(cls._build_populate(name, plan))
+        new_dct["_sorted_field_names"] = tuple(sorted(fields))
+
+        # Field values are stored in slots rather than the instance dict. The
+        # base models do not declare slots so instances still have a dict for
+        # any ad-hoc attributes.
+        if fields and "__slots__" not in new_dct:
+            inherited = cls._inherited_slots(parents)
+            new_dct["__slots__"] = tuple(
+                key
+                for key in list(fields) + ["_api_client"]
+                if key not in inherited
+            )
 
         return super().__new__(cls, name, parents, new_dct)
 
@@ -94,6 +254,10 @@ class PandoraModel(metaclass=ModelMetaClass):
     other methods. The end result object after loading from JSON will be a
     normal python object with all fields declared in the schema populated and
     consumers of these instances can ignore all of the details of this class.
+
+    from_json skips __init__ for models that don't define their own because
+    populating sets every field anyway. Models that do define __init__ have it
+    called with the API client before their fields are populated.
     """
 
     @classmethod
@@ -104,15 +268,8 @@ class PandoraModel(metaclass=ModelMetaClass):
     def __init__(self, api_client):
         self._api_client = api_client
 
-        safe_types = (type(None), str, bytes, int, bool)
-
-        for key, value in self._fields.items():
-            default = getattr(value, "default", None)
-
-            if not isinstance(default, safe_types):
-                default = type(default)()
-
-            setattr(self, key, default)
+        for key, default, factory in self._defaults:
+            setattr(self, key, factory() if factory else default)
 
     @staticmethod
     def populate_fields(api_client, instance, data):
@@ -122,44 +279,34 @@ class PandoraModel(metaclass=ModelMetaClass):
         declared fields on that model and populate the values of their Field
         and SyntheticField classes. All declared fields will have a value after
         this function runs even if they are missing from the incoming JSON.
-        """
-        for key, value in instance.__class__._fields.items():
-            default = getattr(value, "default", None)
-            newval = data.get(value.field, default)
-
-            if isinstance(value, SyntheticField):
-                newval = value.formatter(api_client, data, newval)
-                setattr(instance, key, newval)
-                continue
-
-            model_class = getattr(value, "model", None)
-            if newval and model_class:
-                if isinstance(newval, list):
-                    newval = model_class.from_json_list(api_client, newval)
-                else:
-                    newval = model_class.from_json(api_client, newval)
 
-            if newval and value.formatter:
-                newval = value.formatter(api_client, newval)
-
-            setattr(instance, key, newval)
+        The metaclass generates a populate function specialized to each
+        model class from its populate plan so this just dispatches to it.
+        """
+        instance._populate(api_client, instance, data)
 
     @classmethod
     def from_json(cls, api_client, data):
         """Convert one JSON value to a model object"""
-        self = cls(api_client)
+        # Populating sets every field so the defaults the base __init__ would
+        # set are all overwritten anyway, skip it and populate the new
+        # instance once. A model's own __init__ may set up other state.
+        if cls.__init__ in _BASE_INITS:
+            self = cls.__new__(cls)
+            self._api_client = api_client
+        else:
+            self = cls(api_client)
+
         PandoraModel.populate_fields(api_client, self, data)
         return self
 
     def _base_repr(self, and_also=None):
         """Common repr logic for subclasses to hook"""
-        items = [
-            "=".join((key, repr(getattr(self, key))))
-            for key in sorted(self._fields.keys())
-        ]
-
-        if items:
-            output = ", ".join(items)
+        if self._sorted_field_names:
+            output = ", ".join(
+                "{}={!r}".format(key, getattr(self, key))
+                for key in self._sorted_field_names
+            )
         else:
             output = None
 
@@ -201,6 +348,8 @@ class PandoraListModel(PandoraModel, list):
         within this object
     """
 
+    __slots__ = ("_index",)
+
     __list_key__ = None
     __list_model__ = None
     __index_key__ = None
@@ -211,32 +360,33 @@ class PandoraListModel(PandoraModel, list):
 
     @classmethod
     def from_json(cls, api_client, data):
-        self = cls(api_client)
-        PandoraModel.populate_fields(api_client, self, data)
-
-        for item in data[cls.__list_key__]:
-            model = cls.__list_model__.from_json(api_client, item)
-
-            if self.__index_key__:
-                value = getattr(model, self.__index_key__)
-                self._index[value] = model
-
-            self.append(model)
+        self = super().from_json(api_client, data)
+
+        models = cls.__list_model__.from_json_list(
+            api_client, data[cls.__list_key__]
+        )
+        self.extend(models)
+
+        index_key = cls.__index_key__
+        if index_key:
+            self._index = {
+                getattr(model, index_key): model for model in models
+            }
+        else:
+            self._index = {}
 
         return self
 
     def __getitem__(self, key):
-        item = self._index.get(key, None)
-        if item:
-            return item
-        else:
+        # Positions and slices never need the index lookup, anything else is
+        # an index key
+        if isinstance(key, (int, slice)):
             return list.__getitem__(self, key)
+        else:
+            return self._index[key]
 
     def __contains__(self, key):
-        if key in self._index:
-            return True
-        else:
-            return list.__contains__(self, key)
+        return key in self._index or list.__contains__(self, key)
 
     def keys(self):
         return self._index.keys()
@@ -290,19 +440,19 @@ class PandoraDictListModel(PandoraModel, dict):
 
     @classmethod
     def from_json(cls, api_client, data):
-        self = cls(api_client)
-        PandoraModel.populate_fields(api_client, self, data)
+        self = super().from_json(api_client, data)
 
-        for item in data[self.__dict_list_key__]:
-            key = item[self.__dict_key__]
-            self[key] = []
+        dict_key, list_key = cls.__dict_key__, cls.__list_key__
+        from_json_list = cls.__list_model__.from_json_list
 
-            for part in item[self.__list_key__]:
-                self[key].append(
-                    cls.__list_model__.from_json(api_client, part)
-                )
+        for item in data[cls.__dict_list_key__]:
+            self[item[dict_key]] = from_json_list(api_client, item[list_key])
 
         return self
 
     def __repr__(self):
         return self._base_repr(and_also=dict.__repr__(self))
+
+
+# Initializers that only set field defaults, from_json can skip these
+_BASE_INITS = frozenset((PandoraModel.__init__, PandoraListModel.__init__))
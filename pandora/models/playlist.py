@@ -1,9 +1,28 @@
 from enum import Enum
 
-from ..client import BaseAPIClient
 from ._base import Field, SyntheticField, PandoraModel, PandoraListModel
 
 
+# These are exposed to consumers on BaseAPIClient. They live here so that the
+# client can import the models at module level without an import cycle.
+LOW_AUDIO_QUALITY = "lowQuality"
+MED_AUDIO_QUALITY = "mediumQuality"
+HIGH_AUDIO_QUALITY = "highQuality"
+
+# Qualities to try for each preferred quality, best first. Ensures that the
+# bitrate used will always be the same or lower quality than was specified to
+# prevent audio from skipping for slow connections.
+_AUDIO_QUALITY_ORDER = (
+    HIGH_AUDIO_QUALITY,
+    MED_AUDIO_QUALITY,
+    LOW_AUDIO_QUALITY,
+)
+_AUDIO_QUALITY_FALLBACKS = {
+    quality: _AUDIO_QUALITY_ORDER[i:]
+    for i, quality in enumerate(_AUDIO_QUALITY_ORDER)
+}
+
+
 class AdditionalAudioUrl(Enum):
     HTTP_40_AAC_MONO = "HTTP_40_AAC_MONO"
     HTTP_64_AAC = "HTTP_64_AAC"
@@ -51,7 +70,7 @@ class AudioField(SyntheticField):
         # work.
         if audio_url and not url_map:
             url_map = {
-                BaseAPIClient.HIGH_AUDIO_QUALITY: {
+                HIGH_AUDIO_QUALITY: {
                     "audioUrl": audio_url,
                     "bitrate": 64,
                     "encoding": "aacplus",
@@ -60,28 +79,19 @@ class AudioField(SyntheticField):
         elif not url_map:  # No audio url available (e.g. ad tokens)
             return None
 
-        valid_audio_formats = [
-            BaseAPIClient.HIGH_AUDIO_QUALITY,
-            BaseAPIClient.MED_AUDIO_QUALITY,
-            BaseAPIClient.LOW_AUDIO_QUALITY,
-        ]
-
-        # Only iterate over sublist, starting at preferred audio quality, or
-        # from the beginning of the list if nothing is found. Ensures that the
-        # bitrate used will always be the same or lower quality than was
-        # specified to prevent audio from skipping for slow connections.
-        preferred_quality = api_client.default_audio_quality
-        if preferred_quality in valid_audio_formats:
-            i = valid_audio_formats.index(preferred_quality)
-            valid_audio_formats = valid_audio_formats[i:]
-
-        for quality in valid_audio_formats:
+        # Start at the preferred audio quality, or from the best quality if
+        # the preference is unknown
+        qualities = _AUDIO_QUALITY_FALLBACKS.get(
+            api_client.default_audio_quality, _AUDIO_QUALITY_ORDER
+        )
+
+        for quality in qualities:
             audio_url = url_map.get(quality)
 
             if audio_url:
                 return audio_url[self.field]
 
-        return audio_url[self.field] if audio_url else None
+        return None
 
 
 class AdditionalUrlField(SyntheticField):
@@ -111,5 +111,5 @@ class GenreStationList(PandoraDictListModel):
     __list_model__ = GenreStation
 
     def has_changed(self):
-        checksum = self._api_client.get_station_list_checksum()
+        checksum = self._api_client.get_genre_stations_checksum()
         return checksum != self.checksum
@@ -13,13 +13,40 @@ API consumers should use one of the API clients in the pandora.client package.
 import random
 import time
 import json
-import base64
+import binascii
+import functools
+import threading
+from collections import namedtuple
 import blowfish
 import requests
+from urllib.parse import quote
 from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from .errors import PandoraException
 
+# pycryptodomex provides a much faster C implementation of Blowfish than the
+# pure python blowfish library but is an optional dependency.
+try:
+    from Cryptodome.Cipher import Blowfish as cryptodome_blowfish
+except ImportError:  # pragma: no cover
+    cryptodome_blowfish = None
+
+# orjson is an optional, faster replacement for the stdlib JSON codec. The
+# transport works with bytes end-to-end so the stdlib output is encoded to
+# match what orjson returns.
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+    # Compact like orjson, every byte of the body is encrypted and hex encoded
+    def _json_dumps(data):
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
 
 DEFAULT_API_HOST = "tuner.pandora.com/services/json/"
 
@@ -52,8 +79,10 @@ def retries(max_tries, exceptions=(Exception,)):
 
                 except exceptions as exc:
                     # Don't retry for PandoraExceptions - unlikely that result
-                    # will change for same set of input parameters.
-                    if isinstance(exc, PandoraException):
+                    # will change for same set of input parameters. HTTP error
+                    # statuses mean the server got the call, which may not be
+                    # safe to send again.
+                    if isinstance(exc, (PandoraException, requests.HTTPError)):
                         raise
                     if retries_left > 0:
                         time.sleep(
@@ -94,12 +123,58 @@ class RetryingSession(requests.Session):
     This Requests session uses an HTTPAdapter that retries on connection
     failure three times. The Pandora API is fairly aggressive about closing
     connections on clients and the default session doesn't retry.
+
+    The connection pool is sized so that bursts of calls, such as loading
+    playlists for several stations, reuse kept-alive connections rather
+    than paying for a new TLS handshake once the default pool is full.
     """
 
+    POOL_CONNECTIONS = 4
+    POOL_MAXSIZE = 16
+
     def __init__(self):
         super().__init__()
-        self.mount("https://", HTTPAdapter(max_retries=3))
-        self.mount("http://", HTTPAdapter(max_retries=3))
+
+        # Only failed connections are retried. API calls are POSTs and many
+        # are not idempotent (createStation, addFeedback, registerAd), so an
+        # error response may have been applied and must not be resent. The
+        # retries decorator on APITransport.__call__ also re-raises HTTP error
+        # statuses rather than resending.
+        retries = Retry(total=3, backoff_factor=0.2)
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=self.POOL_MAXSIZE,
+            max_retries=retries,
+        )
+
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+
+# Everything a request needs from the login state: the pre-quoted query
+# string and the token field merged into the request body
+_AuthState = namedtuple("_AuthState", ("query", "body"))
+
+
+def _auth_attribute(name):
+    """Transport attribute that rebuilds the cached auth state on write
+
+    The auth query string and body token only depend on a handful of
+    attributes that change at login time so they are cached on the transport
+    and rebuilt whenever one of these attributes is assigned. The new state
+    replaces the old one in a single assignment so a request built on another
+    thread sees either the old or the new state, never a stale rebuild.
+    """
+    attr = "_{}".format(name)
+
+    def getter(self):
+        return getattr(self, attr)
+
+    def setter(self, value):
+        setattr(self, attr, value)
+        self._auth = self._build_auth_state()
+
+    return property(getter, setter)
 
 
 class APITransport:
@@ -110,27 +185,85 @@ class APITransport:
     details. Once setup the transport acts like a callable.
     """
 
+    __slots__ = (
+        "cryptor",
+        "auth_lock",
+        "_api_host",
+        "_tls_url",
+        "_plain_url",
+        "start_time",
+        "server_sync_time",
+        "_http",
+        "_url_status",
+        "_url_status_lock",
+        "_auth",
+        "_partner_auth_token",
+        "_user_auth_token",
+        "_partner_id",
+        "_user_id",
+    )
+
     API_VERSION = "5"
 
-    REQUIRE_RESET = ("auth.partnerLogin",)
-    NO_ENCRYPT = ("auth.partnerLogin",)
-    REQUIRE_TLS = (
-        "auth.partnerLogin",
-        "auth.userLogin",
-        "station.getPlaylist",
-        "user.createUser",
+    # Sent with every request, set once on the session rather than per call.
+    # The request bodies are always hex or JSON text.
+    HEADERS = {
+        "User-agent": "pianobar-2022.04.01",
+        "Content-Type": "text/plain",
+    }
+
+    # Audio URLs are short-lived so reachable URLs are only cached briefly
+    URL_STATUS_TTL = 30
+    URL_STATUS_CACHE_SIZE = 256
+
+    REQUIRE_RESET = frozenset({"auth.partnerLogin"})
+    NO_ENCRYPT = frozenset({"auth.partnerLogin"})
+    REQUIRE_TLS = frozenset(
+        {
+            "auth.partnerLogin",
+            "auth.userLogin",
+            "station.getPlaylist",
+            "user.createUser",
+        }
     )
 
+    partner_auth_token = _auth_attribute("partner_auth_token")
+    user_auth_token = _auth_attribute("user_auth_token")
+    partner_id = _auth_attribute("partner_id")
+    user_id = _auth_attribute("user_id")
+
+    @property
+    def api_host(self):
+        return self._api_host
+
+    @api_host.setter
+    def api_host(self, value):
+        # There are only two possible endpoint URLs for a host so both are
+        # built once here rather than for every call
+        self._api_host = value
+        self._tls_url = "https://{}".format(value)
+        self._plain_url = "http://{}".format(value)
+
     def __init__(self, cryptor, api_host=DEFAULT_API_HOST, proxy=None):
         self.cryptor = cryptor
+        self.auth_lock = threading.RLock()
         self.api_host = api_host
         self._http = RetryingSession()
+        self._http.headers.update(self.HEADERS)
+        self._url_status = {}
+        self._url_status_lock = threading.Lock()
+
+        self._partner_auth_token = self._user_auth_token = None
+        self._partner_id = self._user_id = None
 
         if proxy:
             self._http.proxies = {"http": proxy, "https": proxy}
 
         self.reset()
 
+    def close(self):
+        self._http.close()
+
     def reset(self):
         self.partner_auth_token = None
         self.user_auth_token = None
@@ -160,14 +293,22 @@ class APITransport:
 
         return None
 
+    # The sync time is derived from the monotonic clock so that adjustments
+    # to the wall clock during a session can't move it backwards
     @property
     def sync_time(self):
-        if not self.server_sync_time:
+        # Read both once, a login on another thread may be resetting them
+        server_sync_time, start_time = self.server_sync_time, self.start_time
+
+        if not server_sync_time or start_time is None:
             return None
 
-        return int(self.server_sync_time + (time.time() - self.start_time))
+        return int(server_sync_time + (time.monotonic() - start_time))
 
     def remove_empty_values(self, data):
+        if None not in data.values():
+            return data
+
         return {k: v for k, v in data.items() if v is not None}
 
     @sync_time.setter
@@ -179,47 +320,79 @@ class APITransport:
             self.reset()
 
         if not self.start_time:
-            self.start_time = int(time.time())
+            self.start_time = time.monotonic()
 
     def _make_http_request(self, url, data, params):
-        try:
-            data = data.encode("utf-8")
-        except AttributeError:
-            pass
-
-        params = self.remove_empty_values(params)
-        headers = {"User-agent": "pianobar-2022.04.01"}
-
-        result = self._http.post(
-            url, data=data, params=params, headers=headers
-        )
+        result = self._http.post(url, data=data, params=params)
         result.raise_for_status()
         return result.content
 
     def test_url(self, url):
-        return self._http.head(url).status_code == requests.codes.OK
-
-    def _build_params(self, method):
-        return {
-            "method": method,
-            "auth_token": self.auth_token,
-            "partner_id": self.partner_id,
-            "user_id": self.user_id,
-        }
+        now = time.monotonic()
 
-    def _build_url(self, method):
-        return "{}://{}".format(
-            "https" if method in self.REQUIRE_TLS else "http", self.api_host
+        with self._url_status_lock:
+            expires = self._url_status.get(url)
+
+        if expires is not None and expires > now:
+            return True
+
+        status = self._http.head(url).status_code == requests.codes.OK
+
+        # Failures may be transient and callers retry until the URL comes
+        # up, so only reachable URLs are remembered
+        if status:
+            with self._url_status_lock:
+                if len(self._url_status) >= self.URL_STATUS_CACHE_SIZE:
+                    self._url_status.pop(next(iter(self._url_status)), None)
+
+                self._url_status[url] = now + self.URL_STATUS_TTL
+
+        return status
+
+    def _build_auth_state(self):
+        # Auth tokens are base64-ish and may contain characters that need
+        # quoting, that cost is paid once per login rather than per call
+        values = (
+            ("auth_token", self.auth_token),
+            ("partner_id", self.partner_id),
+            ("user_id", self.user_id),
+        )
+
+        query = "".join(
+            "&{}={}".format(key, quote(str(value), safe=""))
+            for key, value in values
+            if value is not None
         )
 
-    def _build_data(self, method, data):
-        data["userAuthToken"] = self.user_auth_token
+        if self.user_auth_token:
+            body = {"userAuthToken": self.user_auth_token}
+        elif self.partner_auth_token:
+            body = {"partnerAuthToken": self.partner_auth_token}
+        else:
+            body = {}
+
+        return _AuthState(query, body)
 
-        if not self.user_auth_token and self.partner_auth_token:
-            data["partnerAuthToken"] = self.partner_auth_token
+    def _build_params(self, method, auth=None):
+        auth = self._auth if auth is None else auth
+        return "method=" + quote(method) + auth.query
+
+    def _build_url(self, method):
+        return self._tls_url if method in self.REQUIRE_TLS else self._plain_url
 
-        data["syncTime"] = self.sync_time
-        data = json.dumps(self.remove_empty_values(data))
+    def _build_data(self, method, data, auth=None):
+        auth = self._auth if auth is None else auth
+
+        # Only the caller supplied values need filtering, the auth values are
+        # added only when they are set
+        data = self.remove_empty_values(data)
+        data.update(auth.body)
+
+        sync_time = self.sync_time
+        if sync_time is not None:
+            data["syncTime"] = sync_time
+
+        data = _json_dumps(data)
 
         if method not in self.NO_ENCRYPT:
             data = self.cryptor.encrypt(data)
@@ -227,7 +400,7 @@ class APITransport:
         return data
 
     def _parse_response(self, result):
-        result = json.loads(result.decode("utf-8"))
+        result = _json_loads(result)
 
         if result["stat"] == "ok":
             return result["result"] if "result" in result else None
@@ -236,11 +409,17 @@ class APITransport:
 
     @retries(3)
     def __call__(self, method, **data):
-        self._start_request(method)
+        # Requests are built under the auth lock so they never see a login
+        # half done, clients hold it while they log in. The auth state is
+        # read once so the query string and body come from the same login.
+        with self.auth_lock:
+            self._start_request(method)
+
+            auth = self._auth
+            url = self._build_url(method)
+            data = self._build_data(method, data, auth)
+            params = self._build_params(method, auth)
 
-        url = self._build_url(method)
-        data = self._build_data(method, data)
-        params = self._build_params(method)
         result = self._make_http_request(url, data, params)
 
         return self._parse_response(result)
@@ -259,20 +438,31 @@ class BlowfishCryptor:
 
     block_size = 8
 
+    # The block size is a power of two so the remainder is a mask and every
+    # possible padding can be built once up front
+    _block_mask = block_size - 1
+    _paddings = tuple(bytes((i,)) * i for i in range(block_size + 1))
+
     def _add_padding(self, data):
-        pad_size = self.block_size - (len(data) % self.block_size)
-        padding = (chr(pad_size) * pad_size).encode("ascii")
-        return data.encode("utf-8") + padding
+        pad_size = self.block_size - (len(data) & self._block_mask)
+        return data + self._paddings[pad_size]
 
-    @staticmethod
-    def _strip_padding(data):
-        pad_size = int(data[-1])
+    def _strip_padding(self, data):
+        return data[: -self._padding_size(data)]
 
-        computed = b"".join([chr(pad_size).encode("ascii")] * pad_size)
-        if not data[-pad_size:] == computed:
+    def _padding_size(self, data):
+        pad_size = data[-1]
+
+        # Only the tail of the message is checked, a zero pad size would match
+        # the whole message and is never valid. Padding is never longer than
+        # a block so the expected tail comes from the precomputed table.
+        if not 0 < pad_size <= self.block_size:
+            raise ValueError("Invalid padding")
+
+        if not data.endswith(self._paddings[pad_size]):
             raise ValueError("Invalid padding")
 
-        return data[:-pad_size]
+        return pad_size
 
 
 class PurePythonBlowfish(BlowfishCryptor):
@@ -292,27 +482,76 @@ class PurePythonBlowfish(BlowfishCryptor):
         return b"".join(self.cipher.encrypt_ecb(self._add_padding(data)))
 
 
+class CryptodomeBlowfish(BlowfishCryptor):
+    """Pycryptodome Blowfish Cryptor
+
+    Uses the C Blowfish implementation from pycryptodomex. The ECB cipher is
+    stateless so a single cipher object is reused for every message.
+
+    Messages are decrypted into a single buffer and encrypted in place so that
+    padding and stripping don't each allocate another copy of the message.
+    """
+
+    def __init__(self, key):
+        self.cipher = cryptodome_blowfish.new(
+            key.encode("ascii"), cryptodome_blowfish.MODE_ECB
+        )
+
+    def decrypt(self, data, strip_padding=True):
+        buf = bytearray(len(data))
+        self.cipher.decrypt(data, output=buf)
+
+        if strip_padding:
+            pad_size = self._padding_size(buf)
+            del buf[-pad_size:]
+
+        return buf
+
+    def encrypt(self, data):
+        buf = bytearray(data)
+        buf += self._paddings[self.block_size - (len(buf) & self._block_mask)]
+        self.cipher.encrypt(buf, output=buf)
+        return buf
+
+
+DEFAULT_CRYPTOR = (
+    CryptodomeBlowfish if cryptodome_blowfish else PurePythonBlowfish
+)
+
+
+# Blowfish key setup is expensive, especially for the pure python library, and
+# the ECB cryptors hold no per-message state so they are safely shared between
+# Encryptor instances using the same keys.
+@functools.lru_cache(maxsize=16)
+def _get_cryptor(crypto_class, key):
+    return crypto_class(key)
+
+
 class Encryptor:
     """Pandora Blowfish Encryptor
 
     The blowfish encryptor can encrypt and decrypt the relevant parts of the
     API request and response. It handles the formats that the API expects.
+
+    The API only accepts encrypted bodies as hex encoded text. Other encodings
+    such as base64 would be smaller on the wire but are rejected by the
+    server, so hex it is.
     """
 
-    def __init__(self, in_key, out_key, crypto_class=PurePythonBlowfish):
-        self.bf_out = crypto_class(out_key)
-        self.bf_in = crypto_class(in_key)
+    __slots__ = ("bf_out", "bf_in")
 
-    @staticmethod
-    def _decode_hex(data):
-        return base64.b16decode(data.encode("ascii").upper())
+    def __init__(self, in_key, out_key, crypto_class=DEFAULT_CRYPTOR):
+        self.bf_out = _get_cryptor(crypto_class, out_key)
+        self.bf_in = _get_cryptor(crypto_class, in_key)
 
-    @staticmethod
-    def _encode_hex(data):
-        return base64.b16encode(data).lower()
+    # binascii handles mixed-case input and emits the lower-case hex that the
+    # API expects without the extra case-folding passes that base64.b16* needs.
+    # The C functions are bound directly to avoid a Python frame per call.
+    _decode_hex = staticmethod(binascii.unhexlify)
+    _encode_hex = staticmethod(binascii.hexlify)
 
     def decrypt(self, data):
-        return json.loads(self.bf_out.decrypt(self._decode_hex(data)))
+        return _json_loads(self.bf_out.decrypt(self._decode_hex(data)))
 
     def decrypt_sync_time(self, data):
         return int(self.bf_in.decrypt(self._decode_hex(data), False)[4:-2])
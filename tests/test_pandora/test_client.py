@@ -1,3 +1,4 @@
+import threading
 from unittest import TestCase
 from unittest.mock import Mock, call, patch
 
@@ -9,9 +10,35 @@ from pandora.models.search import SearchResult
 from pandora.models.bookmark import BookmarkList
 from pandora.models.playlist import AdditionalAudioUrl
 from pandora.client import APIClient, BaseAPIClient
+from pandora.transport import RetryingSession
 from tests.test_pandora.test_models import TestAdItem
 
 
+def expired_token_client(responses, expiring_methods, parallel_calls):
+    """Client whose expiring calls all fail together until it logs in again
+
+    The first parallel_calls calls to expiring_methods wait for each other
+    before failing so they are all in flight when the token expires.
+    """
+    transport = Mock(auth_token="old")
+    expired = threading.Barrier(parallel_calls)
+
+    def call(method, **kwargs):
+        if method in expiring_methods and transport.auth_token == "old":
+            expired.wait(timeout=5)
+            raise errors.InvalidAuthToken()
+        return responses.get(method, {})
+
+    def authenticate():
+        transport.auth_token = "new"
+
+    transport.side_effect = call
+    client = APIClient(transport, None, None, None)
+    client._authenticate = Mock(side_effect=authenticate)
+
+    return client
+
+
 class TestAPIClientLogin(TestCase):
     class StubTransport:
         API_VERSION = None
@@ -66,6 +93,47 @@ class TestCallingAPIClient(TestCase):
         client._authenticate.assert_called_with()
         transport.assert_has_calls([call("method"), call("method")])
 
+    def test_parallel_token_errors_log_in_once(self):
+        transport = Mock(auth_token="old")
+        failed = threading.Barrier(2)
+
+        def call(method, **kwargs):
+            if transport.auth_token == "old":
+                failed.wait(timeout=5)
+                raise errors.InvalidAuthToken()
+            return method
+
+        def authenticate():
+            transport.auth_token = "new"
+
+        transport.side_effect = call
+        client = BaseAPIClient(transport, None, None, None)
+        client._authenticate = Mock(side_effect=authenticate)
+
+        results = APIClient._map_concurrently(client, ["a", "b"], 2)
+
+        self.assertEqual(["a", "b"], results)
+        self.assertEqual(1, client._authenticate.call_count)
+
+    def test_call_waits_for_login_in_progress(self):
+        transport = Mock()
+        client = BaseAPIClient(transport, None, None, None)
+
+        with client._auth_lock:
+            worker = threading.Thread(target=client, args=("method",))
+            worker.start()
+            worker.join(0.05)
+            self.assertFalse(transport.called)
+
+        worker.join(5)
+        transport.assert_called_once_with("method")
+
+    def test_login_lock_is_shared_with_transport(self):
+        transport = Mock()
+        client = BaseAPIClient(transport, None, None, None)
+
+        self.assertIs(client._auth_lock, transport.auth_lock)
+
     def test_playlist_fetches_ads(self):
         fake_playlist = {
             "items": [
@@ -81,6 +149,46 @@ class TestCallingAPIClient(TestCase):
             items = client.get_playlist("token_mock")
             self.assertIsInstance(items[1], AdItem)
 
+    def test_playlist_fetches_all_ads_in_order(self):
+        def transport(method, **kwargs):
+            if method == "station.getPlaylist":
+                return {
+                    "items": [
+                        {"adToken": "a"},
+                        {"songName": "test"},
+                        {"adToken": "b"},
+                    ]
+                }
+            return {}
+
+        client = APIClient(Mock(side_effect=transport), None, None, None)
+        items = client.get_playlist("token_mock")
+
+        self.assertIsInstance(items[0], AdItem)
+        self.assertEqual("a", items[0].ad_token)
+        self.assertEqual("test", items[1].song_name)
+        self.assertEqual("b", items[2].ad_token)
+
+    def test_parallel_ad_fetches_log_in_once(self):
+        client = expired_token_client(
+            {"station.getPlaylist": {"items": [{"adToken": "a"}] * 2}},
+            {"ad.getAdMetadata"},
+            2,
+        )
+
+        items = client.get_playlist("token_mock")
+
+        self.assertEqual(["a", "a"], [item.ad_token for item in items])
+        self.assertEqual(1, client._authenticate.call_count)
+
+    def test_nested_ad_fetches_fit_connection_pool(self):
+        playlist_workers = APIClient.get_playlists.__defaults__[0]
+
+        self.assertLessEqual(
+            playlist_workers * APIClient.AD_FETCH_WORKERS,
+            RetryingSession.POOL_MAXSIZE,
+        )
+
     def test_ad_support_enabled_parameters(self):
         with patch.object(APIClient, "__call__") as playlist_mock:
             transport = Mock(side_effect=[errors.InvalidAuthToken(), None])
@@ -104,6 +212,22 @@ class TestCallingAPIClient(TestCase):
             )
 
 
+class TestClosingAPIClient(TestCase):
+    def test_close_closes_transport(self):
+        transport = Mock()
+        BaseAPIClient(transport, None, None, None).close()
+        transport.close.assert_called_once_with()
+
+    def test_context_manager_closes_transport(self):
+        transport = Mock()
+
+        with BaseAPIClient(transport, None, None, None) as client:
+            self.assertIs(transport, client.transport)
+            transport.close.assert_not_called()
+
+        transport.close.assert_called_once_with()
+
+
 class TestGettingQualities(TestCase):
     def test_with_invalid_quality_returning_all(self):
         result = BaseAPIClient.get_qualities("foo", True)
@@ -215,6 +339,190 @@ class TestCreatingGenreStation(TestCase):
             self.assertEqual(station.checksum, "foo")
 
 
+class TestCachingAPIClient(TestCase):
+    def setUp(self):
+        self.transport = Mock()
+        self.api = APIClient(self.transport, None, None, None)
+
+    def test_station_list_reused_while_checksum_matches(self):
+        self.transport.return_value = {"checksum": "foo", "stations": []}
+        stations = self.api.get_station_list()
+
+        self.assertIs(stations, self.api.get_station_list())
+        self.transport.assert_called_with("user.getStationListChecksum")
+        self.assertEqual(2, self.transport.call_count)
+
+    def test_station_list_refetched_when_checksum_changes(self):
+        self.transport.return_value = {"checksum": "foo", "stations": []}
+        stations = self.api.get_station_list()
+
+        self.transport.return_value = {"checksum": "bar", "stations": []}
+        self.assertIsNot(stations, self.api.get_station_list())
+        self.transport.assert_called_with(
+            "user.getStationList", includeStationArtUrl=True
+        )
+
+    def test_genre_stations_reused_while_checksum_matches(self):
+        self.transport.return_value = {"checksum": "foo", "categories": []}
+        stations = self.api.get_genre_stations()
+
+        self.assertIs(stations, self.api.get_genre_stations())
+        self.transport.assert_called_with("station.getGenreStationsChecksum")
+        self.assertEqual(3, self.transport.call_count)
+
+    def test_cold_genre_stations_reuse_background_worker(self):
+        self.transport.return_value = {
+            "checksum": "foo",
+            "categories": [],
+            "items": [],
+        }
+
+        self.api.prefetch_playlist("st")
+        executor = self.api._background_executor
+        self.api.get_genre_stations()
+
+        self.assertIs(executor, self.api._background_executor)
+        self.api.close()
+        self.assertIsNone(self.api._background_executor)
+
+    def test_genre_stations_refetched_when_checksum_changes(self):
+        self.transport.return_value = {"checksum": "foo", "categories": []}
+        stations = self.api.get_genre_stations()
+
+        self.transport.return_value = {"checksum": "bar", "categories": []}
+        new_stations = self.api.get_genre_stations()
+
+        self.assertIsNot(stations, new_stations)
+        self.assertEqual("bar", new_stations.checksum)
+        self.assertEqual(4, self.transport.call_count)
+
+    def test_cold_genre_stations_log_in_once(self):
+        client = expired_token_client(
+            {
+                "station.getGenreStations": {"categories": []},
+                "station.getGenreStationsChecksum": {"checksum": "foo"},
+            },
+            {"station.getGenreStations", "station.getGenreStationsChecksum"},
+            2,
+        )
+
+        self.assertEqual("foo", client.get_genre_stations().checksum)
+        self.assertEqual(1, client._authenticate.call_count)
+
+    def test_prefetched_playlist_is_used_once(self):
+        self.transport.return_value = {"items": [{"trackToken": "t"}]}
+
+        self.api.prefetch_playlist("st")
+        self.api._prefetched_playlists[("st", ())][1].result()
+        self.assertEqual(1, self.transport.call_count)
+
+        self.assertEqual("t", self.api.get_playlist("st")[0].track_token)
+        self.assertEqual(1, self.transport.call_count)
+
+        self.api.get_playlist("st")
+        self.assertEqual(2, self.transport.call_count)
+
+    def test_stale_prefetched_playlist_is_refetched(self):
+        self.transport.return_value = {"items": [{"trackToken": "t"}]}
+
+        with patch("pandora.client.time.monotonic", return_value=0):
+            self.api.prefetch_playlist("st")
+            self.api._prefetched_playlists[("st", ())][1].result()
+
+        ttl = self.api.PREFETCHED_PLAYLIST_TTL
+        with patch("pandora.client.time.monotonic", return_value=ttl):
+            self.api.get_playlist("st")
+
+        self.assertEqual(2, self.transport.call_count)
+
+    def test_stale_unused_prefetches_are_dropped(self):
+        self.transport.return_value = {"items": []}
+
+        with patch("pandora.client.time.monotonic", return_value=0):
+            self.api.prefetch_playlist("old")
+
+        ttl = self.api.PREFETCHED_PLAYLIST_TTL
+        with patch("pandora.client.time.monotonic", return_value=ttl):
+            self.api.prefetch_playlist("new")
+
+        self.assertEqual([("new", ())], list(self.api._prefetched_playlists))
+        self.api.close()
+
+    def test_failed_prefetch_is_refetched(self):
+        self.transport.side_effect = [
+            errors.PandoraException("failed"),
+            {"items": [{"trackToken": "t"}]},
+        ]
+
+        self.api.prefetch_playlist("st")
+
+        self.assertEqual("t", self.api.get_playlist("st")[0].track_token)
+        self.assertEqual(2, self.transport.call_count)
+
+    def test_prefetched_playlist_requires_matching_urls(self):
+        self.transport.return_value = {"items": []}
+
+        self.api.prefetch_playlist("st")
+        self.api.get_playlist("st", [AdditionalAudioUrl.HTTP_32_WMA])
+
+        self.assertEqual(2, self.transport.call_count)
+        self.assertIn(("st", ()), self.api._prefetched_playlists)
+
+    def test_prefetch_and_foreground_call_log_in_once(self):
+        client = expired_token_client(
+            {
+                "station.getPlaylist": {"items": [{"trackToken": "t"}]},
+                "user.getStationList": {"stations": []},
+            },
+            {"station.getPlaylist", "user.getStationList"},
+            2,
+        )
+
+        client.prefetch_playlist("st")
+        client.get_station_list()
+
+        self.assertEqual("t", client.get_playlist("st")[0].track_token)
+        self.assertEqual(1, client._authenticate.call_count)
+        client.close()
+
+    def test_close_stops_prefetching(self):
+        self.transport.return_value = {"items": []}
+        self.api.prefetch_playlist("st")
+
+        self.api.close()
+
+        self.assertIsNone(self.api._background_executor)
+        self.transport.close.assert_called_once_with()
+
+    def test_explain_track_is_cached(self):
+        self.transport.return_value = {"explanations": []}
+
+        self.api.explain_track("tt")
+        self.api.explain_track("tt")
+
+        self.transport.assert_called_once_with(
+            "track.explainTrack", trackToken="tt"
+        )
+
+    def test_explain_track_cache_is_bounded(self):
+        self.api.EXPLAIN_TRACK_CACHE_SIZE = 2
+        self.transport.return_value = {"explanations": []}
+
+        for token in ("a", "b", "c"):
+            self.api.explain_track(token)
+
+        self.assertEqual(["b", "c"], list(self.api._track_explanations))
+
+    def test_explain_track_cache_evicts_safely_in_parallel(self):
+        self.api.EXPLAIN_TRACK_CACHE_SIZE = 2
+        self.transport.return_value = {"explanations": []}
+        tokens = [str(i) for i in range(200)]
+
+        self.api._map_concurrently(self.api.explain_track, tokens, 8)
+
+        self.assertEqual(2, len(self.api._track_explanations))
+
+
 class TestAdditionalUrls(TestCase):
     def test_non_iterable_string(self):
         with self.assertRaises(TypeError):
@@ -338,6 +646,27 @@ class TestAPIClientExhaustive(TestCase):
             "user.setQuickMix", quickMixStationIds=("id",)
         )
 
+    def test_set_quick_mix_with_list(self):
+        self.api.set_quick_mix(["id1", "id2"])
+        self.transport.assert_called_with(
+            "user.setQuickMix", quickMixStationIds=["id1", "id2"]
+        )
+
+    def test_share_station_with_list(self):
+        self.api.share_station("sid", "token", ["foo@example.com"])
+        self.transport.assert_called_with(
+            "station.shareStation",
+            stationId="sid",
+            stationToken="token",
+            emails=["foo@example.com"],
+        )
+
+    def test_share_music_with_list(self):
+        self.api.share_music("token", ["foo@example.com"])
+        self.transport.assert_called_with(
+            "music.shareMusic", musicToken="token", email="foo@example.com"
+        )
+
     def test_explain_track(self):
         self.api.explain_track("token")
         self.transport.assert_called_with(
@@ -431,6 +760,27 @@ class TestAPIClientExhaustive(TestCase):
             includeExtendedAttributes=True,
         )
 
+    def test_get_playlists(self):
+        self.transport.side_effect = lambda method, stationToken, **kw: {
+            "items": [{"trackToken": stationToken}]
+        }
+
+        playlists = self.api.get_playlists(["a", "b"])
+
+        self.assertEqual(
+            ["a", "b"], [playlist[0].track_token for playlist in playlists]
+        )
+
+    def test_get_stations(self):
+        self.transport.side_effect = lambda method, stationToken, **kw: {
+            "stationToken": stationToken
+        }
+
+        stations = self.api.get_stations(["a", "b", "c"])
+
+        self.assertEqual(["a", "b", "c"], [s.token for s in stations])
+        self.assertEqual(3, self.transport.call_count)
+
     def test_search(self):
         self.transport.return_value = {}
         self.assertIsInstance(
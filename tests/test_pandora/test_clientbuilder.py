@@ -1,4 +1,5 @@
 import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import Mock
 
@@ -144,9 +145,9 @@ class TestFileBasedBuilder(TestCase):
         self.assertEqual(__file__, builder.path)
 
     def test_setting_invalid_path(self):
-        builder = cb.FileBasedClientBuilder("nowhere")
+        builder = cb.PydoraConfigFileBuilder("nowhere")
 
-        with self.assertRaises(IOError):
+        with self.assertRaisesRegex(IOError, "File not found: nowhere"):
             builder.build()
 
         self.assertFalse(builder.file_exists)
@@ -179,6 +180,14 @@ class TestPydoraConfigFileBuilder(TestCase):
         self.assertEqual("b", dct["A"])
         self.assertEqual("d", dct["C"])
 
+    def test_cfg_to_plain_dict(self):
+        cfg = Mock()
+        cfg.items = Mock(return_value=[(" a ", " b ")])
+
+        dct = cb.PydoraConfigFileBuilder.cfg_to_dict(cfg, "foo", dict)
+
+        self.assertEqual({"A": "b"}, dct)
+
     def test_integration(self):
         path = os.path.join(os.path.dirname(__file__), "pydora.cfg")
         cfg = cb.PydoraConfigFileBuilder(path).parse_config()
@@ -223,3 +232,14 @@ class TestPianobarConfigFileBuilder(TestCase):
                 },
             },
         )
+
+    def test_skips_lines_without_values(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".cfg") as file:
+            file.write("bogus line\nuser = foo\npassword = a=b\n")
+            file.flush()
+
+            cfg = cb.PianobarConfigFileBuilder(file.name).parse_config()
+
+        self.assertDictEqual(
+            cfg, {"USER": {"USERNAME": "foo", "PASSWORD": "a=b"}}
+        )
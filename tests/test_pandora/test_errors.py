@@ -1,5 +1,6 @@
 from unittest import TestCase
 
+import pandora.errors as e
 from pandora.errors import InternalServerError, PandoraException
 
 
@@ -14,3 +15,7 @@ class TestPandoraExceptionConstructionFromErrorCode(TestCase):
         error = PandoraException.from_code(-99, "Test Message")
         self.assertIsInstance(error, PandoraException)
         self.assertEqual("Test Message", error.extended_message)
+
+    def test_api_messages_are_not_replaced_by_classes(self):
+        self.assertEqual("Internal Server Error", e.__API_EXCEPTIONS__[0])
+        self.assertIs(InternalServerError, e._EXCEPTIONS_BY_CODE[0])
@@ -1,6 +1,6 @@
 from unittest import TestCase
 from datetime import datetime
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 from pandora.client import APIClient
 from pandora.errors import ParameterMissing
@@ -35,6 +35,64 @@ class TestModelMetaClass(TestCase):
     def test_metaclass_ignores_dunder_fields(self):
         self.assertFalse("__field__" in self.TestModel._fields)
 
+    def test_metaclass_precomputes_defaults(self):
+        class DefaultsModel(metaclass=m.ModelMetaClass):
+            plain = m.Field("plain", default="x")
+            mutable = m.Field("mutable", default=[])
+            synthetic = m.DateField("synthetic")
+
+        self.assertEqual(
+            (
+                ("plain", "x", None),
+                ("mutable", None, list),
+                ("synthetic", None, None),
+            ),
+            DefaultsModel._defaults,
+        )
+
+    def test_metaclass_builds_populate_plan(self):
+        class PlanModel(metaclass=m.ModelMetaClass):
+            plain = m.Field("plain", default="x", model=dict)
+            synthetic = m.DateField("synthetic")
+
+        plain, synthetic = PlanModel._populate_plan
+
+        self.assertEqual(("plain", "plain", "x", None, dict, None), plain)
+        self.assertEqual(("synthetic", "synthetic", None), synthetic[:3])
+        self.assertEqual(
+            PlanModel._fields["synthetic"].formatter, synthetic[3]
+        )
+
+    def test_metaclass_generates_populate_function(self):
+        class GeneratedModel(metaclass=m.ModelMetaClass):
+            plain = m.Field("plain")
+
+        code = GeneratedModel._populate.__code__
+        self.assertEqual("<populate GeneratedModel>", code.co_filename)
+
+    def test_metaclass_sorts_field_names(self):
+        class SortedModel(metaclass=m.ModelMetaClass):
+            b_field = m.Field("b")
+            a_field = m.Field("a")
+
+        self.assertEqual(
+            ("a_field", "b_field"), SortedModel._sorted_field_names
+        )
+
+    def test_metaclass_stores_fields_in_slots(self):
+        self.assertEqual(("a_field", "_api_client"), self.TestModel.__slots__)
+
+    def test_list_model_index_is_a_slot(self):
+        self.assertEqual(("_index",), m.PandoraListModel.__slots__)
+        self.assertNotIn("_index", stm.StationList.__slots__)
+
+    def test_metaclass_does_not_redeclare_inherited_slots(self):
+        class SubModel(self.TestModel):
+            a_field = m.Field("testing")
+            b_field = m.Field("testing")
+
+        self.assertEqual(("b_field",), SubModel.__slots__)
+
 
 class TestDateField(TestCase):
     class SampleModel(m.PandoraModel):
@@ -51,6 +109,33 @@ class TestDateField(TestCase):
         self.assertEqual(expected, model.date_field.replace(microsecond=0))
 
 
+class TestAudioField(TestCase):
+    URL_MAP = {
+        "audioUrlMap": {
+            "highQuality": {"audioUrl": "high"},
+            "lowQuality": {"audioUrl": "low"},
+        }
+    }
+
+    def format(self, preferred_quality):
+        api_client = Mock(default_audio_quality=preferred_quality)
+        field = plm.AudioField("audioUrl")
+        return field.formatter(api_client, self.URL_MAP, None)
+
+    def test_falls_back_to_lower_quality(self):
+        self.assertEqual("low", self.format(APIClient.MED_AUDIO_QUALITY))
+
+    def test_never_uses_higher_quality(self):
+        data = {"audioUrlMap": {"highQuality": {"audioUrl": "high"}}}
+        api_client = Mock(default_audio_quality=APIClient.LOW_AUDIO_QUALITY)
+        field = plm.AudioField("audioUrl")
+
+        self.assertIsNone(field.formatter(api_client, data, None))
+
+    def test_unknown_quality_starts_at_best(self):
+        self.assertEqual("high", self.format("bogusQuality"))
+
+
 class TestAdditionalUrlField(TestCase):
     def test_single_url(self):
         dummy_data = {"_paramAdditionalUrls": ["foo"]}
@@ -112,11 +197,64 @@ class TestPandoraModel(TestCase):
         model = self.TestModel(None)
         self.assertEqual(model.field1, "a string")
 
+    def test_fields_are_not_stored_in_instance_dict(self):
+        model = self.TestModel.from_json(None, self.JSON_DATA)
+        self.assertEqual({}, vars(model))
+
     def test_init_creates_new_instances_of_mutable_types(self):
         model = self.TestModel(None)
         self.assertEqual(model.field2, [])
         self.assertFalse(model.field2 is self.TestModel.THE_LIST)
 
+    def test_from_json_creates_new_instances_of_mutable_types(self):
+        model = self.TestModel.from_json(None, {})
+        self.assertEqual(model.field2, [])
+        self.assertFalse(model.field2 is self.TestModel.THE_LIST)
+
+    def test_from_json_skips_base_init(self):
+        defaults = MagicMock()
+
+        with patch.object(self.TestModel, "_defaults", defaults):
+            model = self.TestModel.from_json(None, self.JSON_DATA)
+
+        self.assertFalse(defaults.__iter__.called)
+        self.assertEqual("a string", model.field1)
+
+    def test_from_json_calls_custom_init(self):
+        class InitModel(m.PandoraModel):
+            field1 = m.Field("field1")
+
+            def __init__(self, api_client):
+                super().__init__(api_client)
+                self.extra = "set up"
+
+        model = InitModel.from_json("client", {"field1": "foo"})
+
+        self.assertEqual("set up", model.extra)
+        self.assertEqual("foo", model.field1)
+        self.assertEqual("client", model._api_client)
+
+    def test_from_json_keeps_immutable_defaults(self):
+        class DefaultsModel(m.PandoraModel):
+            number = m.Field("number", default=0.5)
+            pair = m.Field("pair", default=(1, 2))
+
+        model = DefaultsModel.from_json(None, {})
+
+        self.assertEqual(0.5, model.number)
+        self.assertEqual((1, 2), model.pair)
+
+    def test_from_json_copies_mutable_defaults(self):
+        class DefaultsModel(m.PandoraModel):
+            DEFAULT = [1]
+
+            items = m.Field("items", default=DEFAULT)
+
+        model = DefaultsModel.from_json(None, {})
+
+        self.assertEqual([1], model.items)
+        self.assertFalse(model.items is DefaultsModel.DEFAULT)
+
     def test_populate_fields(self):
         result = self.TestModel.from_json(None, self.JSON_DATA)
         self.assertEqual("a string", result.field1)
@@ -216,6 +354,31 @@ class TestPandoraListModel(TestCase):
     def test_contains(self):
         self.assertTrue("foo" in self.result)
         self.assertTrue(self.result[0] in self.result)
+        self.assertFalse("baz" in self.result)
+
+    def test_getting_slices(self):
+        self.assertEqual(["Bar"], [i.fieldS1 for i in self.result[1:]])
+
+    def test_getting_missing_key(self):
+        with self.assertRaises(KeyError):
+            self.result["baz"]
+
+    def test_init_creates_empty_index(self):
+        model = self.TestModel(None)
+
+        self.assertEqual([], list(model.keys()))
+        self.assertIsNone(model.field1)
+
+    def test_unindexed_model(self):
+        class UnindexedModel(m.PandoraListModel):
+            __list_key__ = "field2"
+            __list_model__ = ExampleSubModel
+
+        result = UnindexedModel.from_json(None, self.JSON_DATA)
+
+        self.assertEqual(2, len(result))
+        self.assertEqual([], list(result.keys()))
+        self.assertNotIn("foo", result)
 
 
 class TestPandoraDictListModel(TestCase):
@@ -700,7 +863,7 @@ class TestGenreStationList(TestCase):
 
     def test_has_changed(self):
         api_client = Mock()
-        api_client.get_station_list_checksum.return_value = "foo"
+        api_client.get_genre_stations_checksum.return_value = "foo"
 
         stations = stm.GenreStationList.from_json(api_client, self.TEST_DATA)
         self.assertTrue(stations.has_changed())
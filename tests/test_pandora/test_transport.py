@@ -1,9 +1,11 @@
 import time
+import threading
 import json
 import random
 import requests
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from unittest.mock import Mock, call, patch
+from urllib3.exceptions import NewConnectionError
 
 from pandora.errors import InvalidAuthToken, PandoraException
 from tests.test_pandora.test_clientbuilder import TestSettingsDictBuilder
@@ -16,6 +18,24 @@ class SysCallError(Exception):
 
 
 class TestTransport(TestCase):
+    def test_requests_are_not_built_during_login(self):
+        transport = t.APITransport(Mock())
+
+        with patch.object(
+            t.APITransport,
+            "_make_http_request",
+            return_value=b'{"stat":"ok"}',
+        ) as request:
+            with transport.auth_lock:
+                worker = threading.Thread(target=transport, args=("foo",))
+                worker.start()
+                worker.join(0.05)
+                self.assertFalse(transport.cryptor.encrypt.called)
+
+            worker.join(5)
+
+        self.assertTrue(request.called)
+
     def test_test_url_should_return_true_if_request_okay(self):
         transport = t.APITransport(Mock())
         transport._http = Mock()
@@ -25,56 +45,116 @@ class TestTransport(TestCase):
 
         self.assertFalse(transport.test_url("foo"))
 
+        transport._http.head.return_value = Mock(status_code=requests.codes.OK)
+        self.assertTrue(transport.test_url("bar"))
+
+    def test_test_url_caches_status_briefly(self):
+        transport = t.APITransport(Mock())
+        transport._http = Mock()
+        transport._http.head.return_value = Mock(status_code=requests.codes.OK)
+
+        with patch.object(time, "monotonic", return_value=100):
+            self.assertTrue(transport.test_url("foo"))
+            self.assertTrue(transport.test_url("foo"))
+
+        self.assertEqual(1, transport._http.head.call_count)
+
+        expired = 100 + transport.URL_STATUS_TTL
+        with patch.object(time, "monotonic", return_value=expired):
+            self.assertTrue(transport.test_url("foo"))
+
+        self.assertEqual(2, transport._http.head.call_count)
+
+    def test_test_url_does_not_cache_failures(self):
+        transport = t.APITransport(Mock())
+        transport._http = Mock()
+        transport._http.head.return_value = Mock(
+            status_code=requests.codes.not_found
+        )
+
+        self.assertFalse(transport.test_url("foo"))
+
         transport._http.head.return_value = Mock(status_code=requests.codes.OK)
         self.assertTrue(transport.test_url("foo"))
+        self.assertEqual(2, transport._http.head.call_count)
+
+    def test_test_url_cache_is_bounded(self):
+        transport = t.APITransport(Mock())
+        transport._http = Mock()
+        transport._http.head.return_value = Mock(status_code=requests.codes.OK)
+
+        for i in range(transport.URL_STATUS_CACHE_SIZE + 1):
+            transport.test_url(str(i))
+
+        self.assertEqual(
+            transport.URL_STATUS_CACHE_SIZE, len(transport._url_status)
+        )
+        self.assertNotIn("0", transport._url_status)
+
+    def _patch_transport(self, name, **kwargs):
+        return patch.object(t.APITransport, name, **kwargs)
 
     def test_call_should_retry_max_times_on_sys_call_error(self):
-        with self.assertRaises(SysCallError):
-            client = TestSettingsDictBuilder._build_minimal()
+        make_request = self._patch_transport(
+            "_make_http_request", side_effect=SysCallError("error_mock")
+        )
 
-            time.sleep = Mock()
-            client.transport._make_http_request = Mock(
-                side_effect=SysCallError("error_mock")
-            )
-            client.transport._start_request = Mock()
+        with make_request, self._patch_transport("_start_request") as start:
+            with self.assertRaises(SysCallError):
+                client = TestSettingsDictBuilder._build_minimal()
 
-            client("method")
+                time.sleep = Mock()
+
+                client("method")
+
+        start.assert_has_calls([call("method")])
+        assert start.call_count == 3
+
+    def test_call_should_not_retry_for_http_errors(self):
+        make_request = self._patch_transport(
+            "_make_http_request", side_effect=requests.HTTPError("503")
+        )
 
-        client.transport._start_request.assert_has_calls([call("method")])
-        assert client.transport._start_request.call_count == 3
+        with make_request, self._patch_transport("_start_request") as start:
+            with self.assertRaises(requests.HTTPError):
+                client = TestSettingsDictBuilder._build_minimal()
+                client("method")
+
+        self.assertEqual(1, start.call_count)
 
     def test_call_should_not_retry_for_pandora_exceptions(self):
-        with self.assertRaises(PandoraException):
-            client = TestSettingsDictBuilder._build_minimal()
+        make_request = self._patch_transport(
+            "_make_http_request", side_effect=PandoraException("error_mock")
+        )
 
-            time.sleep = Mock()
-            client.transport._make_http_request = Mock(
-                side_effect=PandoraException("error_mock")
-            )
-            client.transport._start_request = Mock()
+        with make_request, self._patch_transport("_start_request") as start:
+            with self.assertRaises(PandoraException):
+                client = TestSettingsDictBuilder._build_minimal()
+
+                time.sleep = Mock()
 
-            client("method")
+                client("method")
 
-            client.transport._start_request.assert_has_calls([call("method")])
-            assert client.transport._start_request.call_count == 1
+        start.assert_has_calls([call("method")])
+        assert start.call_count == 1
 
     def test_call_should_retry_if_auth_token_expired(self):
-        with self.assertRaises(InvalidAuthToken):
-            client = TestSettingsDictBuilder._build_minimal()
+        make_request = self._patch_transport(
+            "_make_http_request", side_effect=InvalidAuthToken("error_mock")
+        )
 
-            time.sleep = Mock()
-            client.transport._make_http_request = Mock(
-                side_effect=InvalidAuthToken("error_mock")
-            )
-            client.transport._start_request = Mock()
+        with make_request, self._patch_transport("_start_request") as start:
+            with self.assertRaises(InvalidAuthToken):
+                client = TestSettingsDictBuilder._build_minimal()
 
-            client._authenticate = Mock()
+                time.sleep = Mock()
+                client._authenticate = Mock()
 
-            client("method")
+                client("method")
 
-            client.transport._start_request.assert_has_calls([call("method")])
-            assert client.transport._start_request.call_count == 2
-            assert client._authenticate.call_count == 1
+        start.assert_has_calls([call("method")])
+        assert start.call_count == 2
+        assert client._authenticate.call_count == 1
 
     def test_complete_request(self):
         transport = t.APITransport(Mock())
@@ -84,9 +164,7 @@ class TestTransport(TestCase):
         http_result.content = b'{"stat":"ok","result":"bar"}'
         transport._http.post.return_value = http_result
 
-        self.assertEqual(
-            "bar", transport(t.APITransport.NO_ENCRYPT[0], foo="bar")
-        )
+        self.assertEqual("bar", transport("auth.partnerLogin", foo="bar"))
 
 
 class TestTransportSetters(TestCase):
@@ -113,7 +191,7 @@ class TestTransportSetters(TestCase):
         )
 
         self.transport.start_time = 10
-        with patch.object(time, "time", return_value=30):
+        with patch.object(time, "monotonic", return_value=30):
             self.assertEqual(476, self.transport.sync_time)
 
     def test_set_user(self):
@@ -128,6 +206,12 @@ class TestTransportSetters(TestCase):
         self.assertEqual("auth", self.transport.user_auth_token)
         self.assertEqual("auth", self.transport.auth_token)
 
+    def test_sync_time_during_reset(self):
+        self.transport.server_sync_time = 123
+        self.transport.start_time = None
+
+        self.assertIsNone(self.transport.sync_time)
+
     def test_getting_auth_token_no_login(self):
         self.assertIsNone(self.transport.auth_token)
         self.assertIsNone(self.transport.sync_time)
@@ -158,6 +242,26 @@ class TestRetries(TestCase):
         self.assertIsNone(foo())
 
 
+class TestRetryingSession(TestCase):
+    def test_adapter_is_shared_and_pooled(self):
+        session = t.RetryingSession()
+        adapter = session.get_adapter("https://example.com")
+
+        self.assertIs(adapter, session.get_adapter("http://example.com"))
+        self.assertEqual(16, adapter._pool_maxsize)
+        self.assertEqual(3, adapter.max_retries.total)
+
+    def test_api_posts_retry_connection_errors_only(self):
+        retries = t.RetryingSession().get_adapter("https://x").max_retries
+
+        self.assertFalse(retries.is_retry("POST", 503))
+
+        retried = retries.increment(
+            "POST", "https://x", error=NewConnectionError(None, "refused")
+        )
+        self.assertEqual(2, retried.total)
+
+
 class TestParseResponse(TestCase):
     VALID_MSG_NO_BODY_JSON = b'{"stat":"ok"}'
     VALID_MSG_JSON = b'{"stat":"ok", "result":{"foo":"bar"}}'
@@ -193,15 +297,38 @@ class TestTransportRequestPrep(TestCase):
         self.assertEqual(10, self.transport.start_time)
 
     def test_start_request_with_reset(self):
-        self.transport.reset = Mock()
-        self.transport._start_request(self.transport.REQUIRE_RESET[0])
-        self.transport.reset.assert_called_with()
+        with patch.object(t.APITransport, "reset") as reset:
+            self.transport._start_request("auth.partnerLogin")
+            reset.assert_called_with()
 
     def test_start_request_without_time(self):
-        with patch.object(time, "time", return_value=10.0):
+        with patch.object(time, "monotonic", return_value=10.0):
             self.transport._start_request("method_name")
             self.assertEqual(10, self.transport.start_time)
 
+    def test_build_url(self):
+        self.transport.api_host = "example.com"
+
+        self.assertEqual(
+            "https://example.com",
+            self.transport._build_url("auth.userLogin"),
+        )
+        self.assertEqual(
+            "http://example.com",
+            self.transport._build_url("station.getStation"),
+        )
+
+    def test_close_closes_session(self):
+        self.transport._http = Mock()
+        self.transport.close()
+        self.transport._http.close.assert_called_once_with()
+
+    def test_session_headers(self):
+        headers = self.transport._http.headers
+
+        self.assertEqual("pianobar-2022.04.01", headers["User-Agent"])
+        self.assertEqual("text/plain", headers["Content-Type"])
+
     def test_make_http_request(self):
         # url, data, params
         http = Mock()
@@ -210,20 +337,68 @@ class TestTransportRequestPrep(TestCase):
         http.post.return_value = retval
 
         self.transport._http = http
-        res = self.transport._make_http_request(
-            "/url", b"data", {"a": None, "b": "c"}
-        )
+        res = self.transport._make_http_request("/url", b"data", "b=c")
 
         http.post.assert_called_with(
             "/url",
             data=b"data",
-            params={"b": "c"},
-            headers={"User-agent": "pianobar-2022.04.01"},
+            params="b=c",
         )
         retval.raise_for_status.assert_called_with()
 
         self.assertEqual("foo", res)
 
+    def test_build_params_not_logged_in(self):
+        self.assertEqual(
+            "method=auth.partnerLogin",
+            self.transport._build_params("auth.partnerLogin"),
+        )
+
+    def test_build_params_logged_in(self):
+        self.transport.partner_id = "pid"
+        self.transport.user_id = "uid"
+        self.transport.user_auth_token = "a/b=="
+
+        self.assertEqual(
+            "method=foo&auth_token=a%2Fb%3D%3D&partner_id=pid&user_id=uid",
+            self.transport._build_params("foo"),
+        )
+
+    def test_build_params_rebuilds_after_auth_change(self):
+        self.transport.partner_id = "pid"
+        self.assertEqual(
+            "method=foo&partner_id=pid", self.transport._build_params("foo")
+        )
+
+        self.transport.user_id = "uid"
+        self.assertEqual(
+            "method=foo&partner_id=pid&user_id=uid",
+            self.transport._build_params("foo"),
+        )
+
+        self.transport.reset()
+        self.assertEqual("method=foo", self.transport._build_params("foo"))
+
+    def test_auth_state_is_replaced_on_login(self):
+        before = self.transport._auth
+        self.transport.set_user({"userId": "uid", "userAuthToken": "ut"})
+
+        self.assertEqual({"userAuthToken": "ut"}, self.transport._auth.body)
+        self.assertEqual({}, before.body)
+        self.assertEqual(
+            "method=foo", self.transport._build_params("foo", before)
+        )
+
+    def test_remove_empty_values(self):
+        self.assertEqual(
+            {"a": "b"},
+            self.transport.remove_empty_values({"a": "b", "c": None}),
+        )
+
+    def test_remove_empty_values_reuses_clean_dict(self):
+        data = {"a": "b"}
+        self.assertIs(data, self.transport.remove_empty_values(data))
+
     def test_build_data_not_logged_in(self):
         self.cryptor.encrypt = lambda x: x
 
@@ -231,7 +406,7 @@ class TestTransportRequestPrep(TestCase):
         self.transport.server_sync_time = 123
         self.transport.start_time = 23
 
-        with patch.object(time, "time", return_value=20):
+        with patch.object(time, "monotonic", return_value=20):
             val = self.transport._build_data("foo", {"a": "b", "c": None})
 
         val = json.loads(val)
@@ -239,15 +414,27 @@ class TestTransportRequestPrep(TestCase):
         self.assertEqual("pat", val["partnerAuthToken"])
         self.assertEqual(120, val["syncTime"])
 
+    def test_build_data_after_login_changes(self):
+        self.cryptor.encrypt = lambda x: x
+
+        self.transport.partner_auth_token = "pat"
+        val = json.loads(self.transport._build_data("foo", {}))
+        self.assertEqual("pat", val["partnerAuthToken"])
+
+        self.transport.user_auth_token = "uat"
+        val = json.loads(self.transport._build_data("foo", {}))
+        self.assertEqual("uat", val["userAuthToken"])
+        self.assertNotIn("partnerAuthToken", val)
+
     def test_build_data_no_encrypt(self):
         self.transport.user_auth_token = "uat"
         self.transport.partner_auth_token = "pat"
         self.transport.server_sync_time = 123
         self.transport.start_time = 23
 
-        with patch.object(time, "time", return_value=20):
+        with patch.object(time, "monotonic", return_value=20):
             val = self.transport._build_data(
-                t.APITransport.NO_ENCRYPT[0], {"a": "b", "c": None}
+                "auth.partnerLogin", {"a": "b", "c": None}
             )
 
         val = json.loads(val)
@@ -263,6 +450,14 @@ class CommonCryptorTestCases:
             data = b"12345678\x00"
             self.assertEqual(b"12345678\x00", self.cryptor.decrypt(data))
 
+    def test_decrypt_mismatched_padding(self):
+        with self.assertRaises(ValueError):
+            self.cryptor.decrypt(b"12345\x03\x02\x03")
+
+    def test_decrypt_oversized_padding(self):
+        with self.assertRaises(ValueError):
+            self.cryptor.decrypt(b"\x09" * 16)
+
     def test_decrypt_strip_padding(self):
         data = b"123456\x02\x02"
         self.assertEqual(b"123456", self.cryptor.decrypt(data))
@@ -272,16 +467,16 @@ class CommonCryptorTestCases:
         self.assertEqual(b"123456\x02\x02", self.cryptor.decrypt(data, False))
 
     def test_encrypt(self):
-        data = "123456"
+        data = b"123456"
         self.assertEqual(b"123456\x02\x02", self.cryptor.encrypt(data))
 
+    def test_encrypt_adds_full_block_when_aligned(self):
+        data = b"12345678"
+        self.assertEqual(data + b"\x08" * 8, self.cryptor.encrypt(data))
+
 
 class TestPurePythonBlowfishCryptor(TestCase, CommonCryptorTestCases):
     def setUp(self):
-        # Ugh... blowfish can't even be *imported* in python2
-        if not t.blowfish:
-            t.blowfish = Mock()
-
         self.cipher = Mock()
         self.cipher.decrypt_ecb = lambda x: [x]
         self.cipher.encrypt_ecb = lambda x: [x]
@@ -289,6 +484,30 @@ class TestPurePythonBlowfishCryptor(TestCase, CommonCryptorTestCases):
         self.cryptor.cipher = self.cipher
 
 
+class TestCryptodomeBlowfishCryptor(TestCase, CommonCryptorTestCases):
+    @staticmethod
+    def _copy_to_output(data, output):
+        output[:] = data
+
+    def setUp(self):
+        self.cipher = Mock()
+        self.cipher.decrypt = self._copy_to_output
+        self.cipher.encrypt = self._copy_to_output
+
+        with patch.object(t, "cryptodome_blowfish"):
+            self.cryptor = t.CryptodomeBlowfish("keys")
+
+        self.cryptor.cipher = self.cipher
+
+    @skipUnless(t.cryptodome_blowfish, "pycryptodomex is not installed")
+    def test_round_trip_with_real_cipher(self):
+        cryptor = t.CryptodomeBlowfish("keys")
+        ciphertext = cryptor.encrypt(b"123456")
+
+        self.assertEqual(8, len(ciphertext))
+        self.assertEqual(b"123456", cryptor.decrypt(bytes(ciphertext)))
+
+
 class TestEncryptor(TestCase):
     ENCODED_JSON = "7b22666f6f223a22626172227d"
     UNENCODED_JSON = b'{"foo":"bar"}'
@@ -313,12 +532,24 @@ class TestEncryptor(TestCase):
             {"foo": "bar"}, self.cryptor.decrypt(self.ENCODED_JSON)
         )
 
+    def test_decrypt_upper_case_hex(self):
+        self.assertEqual(
+            {"foo": "bar"}, self.cryptor.decrypt(self.ENCODED_JSON.upper())
+        )
+
     def test_encrypt(self):
         self.assertEqual(
             self.ENCODED_JSON.encode("ascii"),
             self.cryptor.encrypt(self.UNENCODED_JSON),
         )
 
+    def test_cryptors_are_shared_for_the_same_keys(self):
+        other = t.Encryptor("in", "out", self.NoopCrypto)
+
+        self.assertIs(self.cryptor.bf_in, other.bf_in)
+        self.assertIs(self.cryptor.bf_out, other.bf_out)
+        self.assertIsNot(self.cryptor.bf_in, self.cryptor.bf_out)
+
     def test_decrypt_sync_time(self):
         self.assertEqual(
             self.EXPECTED_TIME,